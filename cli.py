@@ -3,7 +3,18 @@
 import argparse
 import logging
 import os
-from typing import Optional
+import shutil
+import signal
+import time
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple
+
+
+# Minimum number of seconds between two progress bar redraws
+PROGRESS_REDRAW_INTERVAL = 0.1
+
+_last_draw_ts = 0.0
+_terminal_width: Optional[int] = None
 
 
 def parse_arguments():
@@ -82,7 +93,31 @@ Examples:
         "-p",
         type=int,
         metavar="N",
-        help="Process N sets in parallel (default: sequential).",
+        help="Process sets with N parallel workers (default: one per CPU core).",
+    )
+    parser.add_argument(
+        "--sheet",
+        action="store_true",
+        help="Save all labels from a text file as a single sheet image instead of one file per set.",
+    )
+    parser.add_argument(
+        "--png-level",
+        type=int,
+        choices=range(10),
+        default=1,
+        metavar="0-9",
+        help="PNG compression level for saved labels, 0-9 (default: 1, fastest).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["png", "webp"],
+        default="png",
+        help="Image format for saved labels (default: png). WebP labels are lossless.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached set information and symbols and fetch fresh data.",
     )
     return parser.parse_args()
 
@@ -109,23 +144,56 @@ def is_text_file(filename: str) -> bool:
 
 
 def get_terminal_width() -> int:
-    """Get terminal width for better formatting."""
+    """Get terminal width for better formatting, cached until the terminal is resized."""
+    global _terminal_width
+    if _terminal_width is None:
+        try:
+            _terminal_width = shutil.get_terminal_size().columns
+        except:
+            _terminal_width = 80
+        _watch_terminal_resize()
+    return _terminal_width
+
+
+def _reset_terminal_width(signum, frame):
+    """Forget the cached terminal width so the next call measures it again."""
+    global _terminal_width
+    _terminal_width = None
+
+
+def _watch_terminal_resize():
+    """Reset the cached terminal width whenever the terminal is resized."""
+    if not hasattr(signal, "SIGWINCH"):
+        return
     try:
-        import shutil
-        return shutil.get_terminal_size().columns
-    except:
-        return 80
+        signal.signal(signal.SIGWINCH, _reset_terminal_width)
+    except ValueError:
+        # Signal handlers can only be installed from the main thread
+        pass
+
+
+@lru_cache(maxsize=None)
+def _bar_segment(char: str, length: int) -> str:
+    """Build a full-length run of a progress bar character once, to be sliced."""
+    return char * length
 
 
 def print_progress_bar(current: int, total: int, prefix: str = "", suffix: str = "", 
                       length: int = 50, fill: str = '█', empty: str = '░') -> None:
-    """Print a progress bar to the terminal."""
+    """Print a progress bar to the terminal, redrawing at most every 100ms."""
+    global _last_draw_ts
     if total == 0:
         return
     
+    # Skip redraws that would arrive faster than the eye can follow
+    now = time.monotonic()
+    if current < total and now - _last_draw_ts < PROGRESS_REDRAW_INTERVAL:
+        return
+    _last_draw_ts = now
+    
     percent = current / total
     filled_length = int(length * percent)
-    bar = fill * filled_length + empty * (length - filled_length)
+    bar = _bar_segment(fill, length)[:filled_length] + _bar_segment(empty, length)[filled_length:]
     
     # Calculate percentage
     percentage = f"{percent:.1%}"
@@ -138,7 +206,8 @@ def print_progress_bar(current: int, total: int, prefix: str = "", suffix: str =
     if len(progress_line) > terminal_width:
         progress_line = progress_line[:terminal_width-3] + "..."
     
-    print(progress_line, end='', flush=True)
+    # Clear whatever is left of a previous, longer line
+    print(progress_line + "\033[K", end='', flush=True)
 
 
 def format_duration(seconds: float) -> str:
@@ -239,3 +308,26 @@ def prompt_for_symbol_batch(set_code: str, set_name: str, remaining_count: int)
     except (KeyboardInterrupt, EOFError):
         print("\nOperation cancelled by user")
         return "SKIP"
+
+
+def prompt_for_missing_symbols(missing: List[Tuple[str, str]]) -> Dict[str, str]:
+    """Ask how to handle every set without a symbol before a batch is rendered."""
+    print(f"\n⚠️  No symbol found for {len(missing)} sets:")
+    for set_code, set_name in missing:
+        print(f"   {set_code:6} {set_name}")
+    
+    decisions = {}
+    for i, (set_code, set_name) in enumerate(missing):
+        choice = prompt_for_symbol_batch(set_code, set_name, len(missing) - i - 1)
+        
+        if choice.startswith("CUSTOM:"):
+            decisions[set_code] = choice[len("CUSTOM:"):]
+        elif choice in ["SKIP_ALL_NO_SYMBOL", "NO_SYMBOL_ALL"]:
+            remaining_choice = "SKIP" if choice == "SKIP_ALL_NO_SYMBOL" else "NO_SYMBOL"
+            for remaining_code, _ in missing[i:]:
+                decisions[remaining_code] = remaining_choice
+            break
+        else:
+            decisions[set_code] = choice
+    
+    return decisions
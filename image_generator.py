@@ -3,21 +3,121 @@
 import os
 import logging
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional, Dict, List, Tuple
 from PIL import Image, ImageDraw, ImageFont
 
 from mtg_api import fetch_set_symbol
 
 
+# Label dimensions in pixels
+LABEL_WIDTH = 760
+LABEL_HEIGHT = 140
+
+# Text layout; the symbol occupies a square of the label height on the left
+LABEL_PADDING = 20  # Padding between elements
+TEXT_START_X = LABEL_HEIGHT + LABEL_PADDING
+AVAILABLE_TEXT_WIDTH = LABEL_WIDTH - TEXT_START_X - LABEL_PADDING
+LINE_GAP = 10  # Gap between the two text lines
+
+# Font sizes for the set name (shrunk down to the minimum to fit) and details
+NAME_FONT_SIZE = 40
+MIN_NAME_FONT_SIZE = 20
+DETAIL_FONT_SIZE = 30
+
+# zlib level for saved labels; they are small and mostly white, so fast
+# compression only costs a few KB per file
+DEFAULT_PNG_COMPRESS_LEVEL = 1
+
+_png_compress_level = DEFAULT_PNG_COMPRESS_LEVEL
+
+# Image formats labels can be saved in, keyed by file extension
+LABEL_FORMATS = {"png": "PNG", "webp": "WEBP"}
+DEFAULT_LABEL_FORMAT = "png"
+
+_label_format = DEFAULT_LABEL_FORMAT
+
+# Tallest image each format can store; libwebp is limited to 16383 pixels
+MAX_IMAGE_HEIGHTS = {"webp": 16383}
+
+# Symbols already scaled to a label height, keyed by (symbol source, height),
+# stored together with the mask to paste them with
+_symbol_cache: Dict[Tuple[str, int], Tuple[Image.Image, Optional[Image.Image]]] = {}
+
+
+def set_png_compress_level(level: int):
+    """Set the zlib compression level used when saving labels."""
+    global _png_compress_level
+    _png_compress_level = level
+
+
+def get_png_compress_level() -> int:
+    """Get the zlib compression level used when saving labels."""
+    return _png_compress_level
+
+
+def set_label_format(label_format: str):
+    """Set the image format, by file extension, used when saving labels."""
+    global _label_format
+    _label_format = label_format
+
+
+def get_label_format() -> str:
+    """Get the image format, by file extension, used when saving labels."""
+    return _label_format
+
+
+def label_filename(set_code: str) -> str:
+    """Get the file name of a set's label in the configured format."""
+    return f"{set_code}_label.{_label_format}"
+
+
+def max_sheet_labels() -> Optional[int]:
+    """Get how many labels fit on one sheet in the configured format, or None if unlimited."""
+    max_height = MAX_IMAGE_HEIGHTS.get(_label_format)
+    return max_height // LABEL_HEIGHT if max_height else None
+
+
+def init_render_worker(png_compress_level: int, label_format: str):
+    """Prepare a worker process for rendering labels."""
+    set_png_compress_level(png_compress_level)
+    set_label_format(label_format)
+    _blank_label()
+
+
+@lru_cache(maxsize=None)
+def _blank_label() -> Image.Image:
+    """Create the white label background that every label starts from a copy of."""
+    return Image.new("RGB", (LABEL_WIDTH, LABEL_HEIGHT), (255, 255, 255))
+
+
+def save_label_image(image: Image.Image, fp) -> None:
+    """Save a label in the configured format using fast encoder settings."""
+    if _label_format == "webp":
+        # Lossless keeps the text crisp; method 0 is libwebp's fastest encoder
+        image.save(fp, format="WEBP", lossless=True, method=0)
+    else:
+        image.save(fp, format="PNG", compress_level=_png_compress_level, optimize=False)
+
+
+@lru_cache(maxsize=64)
+def _font(size: int) -> ImageFont.FreeTypeFont:
+    """Load the default font at the given size, reusing fonts already loaded."""
+    return ImageFont.load_default(size)
+
+
 def add_set_symbol(image: Image.Image, set_code: str, custom_symbol_path: Optional[str] = None, 
                   interactive: bool = True) -> str:
     """Add set symbol to the label image."""
     symbol_image = None
+    cache_key = set_code
     
     # Try to use custom symbol first if provided
     if custom_symbol_path and os.path.exists(custom_symbol_path):
         try:
             symbol_image = Image.open(custom_symbol_path)
+            cache_key = custom_symbol_path
             logging.debug(f"Using custom symbol from {custom_symbol_path}")
         except Exception as e:
             logging.warning(f"Error loading custom symbol: {e}")
@@ -33,9 +133,36 @@ def add_set_symbol(image: Image.Image, set_code: str, custom_symbol_path: Option
                 logging.debug(f"No symbol found for {set_code}, continuing without symbol")
                 return "NO_SYMBOL_USED"
 
+    paste_symbol(image, symbol_image, cache_key)
+    return "SYMBOL_ADDED"
+
+
+def paste_symbol(image: Image.Image, symbol_image: Image.Image, 
+                 cache_key: Optional[str] = None, top: int = 0) -> None:
+    """Scale the symbol to the label height and paste it on the left side of the label at top."""
+    height = LABEL_HEIGHT
+
+    # Reuse a previously scaled copy of the same symbol when possible
+    cached = _symbol_cache.get((cache_key, height)) if cache_key else None
+    if cached is None:
+        cached = _scale_symbol(symbol_image, height)
+        if cache_key:
+            _symbol_cache[(cache_key, height)] = cached
+    scaled_symbol, mask = cached
+
+    # Position symbol at the left side and vertically centered
+    symbol_x = 0
+    symbol_y = top + (height - scaled_symbol.height) // 2
+
+    # Paste the symbol
+    image.paste(scaled_symbol, (symbol_x, symbol_y), mask)
+
+
+def _scale_symbol(symbol_image: Image.Image, 
+                  height: int) -> Tuple[Image.Image, Optional[Image.Image]]:
+    """Scale a symbol to fit a square of the label height and return it with its paste mask."""
     # Get original dimensions
     img_width, img_height = symbol_image.size
-    height = image.height
 
     # Calculate scaling factors for both height and width constraints
     height_scale = height / img_height
@@ -46,77 +173,138 @@ def add_set_symbol(image: Image.Image, set_code: str, custom_symbol_path: Option
     new_width = int(img_width * scale)
     new_height = int(img_height * scale)
 
-    # Resize symbol and convert to RGBA
-    symbol_image = symbol_image.resize((new_width, new_height)).convert("RGBA")
+    # Palette and keyed-transparency symbols are expanded up front so the
+    # resampling filter blends real colors and alpha instead of indices
+    if (symbol_image.mode not in ("1", "L", "RGB", "LA", "RGBA") or 
+            "transparency" in symbol_image.info):
+        symbol_image = symbol_image.convert("RGBA")
+    symbol_image = symbol_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-    # Position symbol at the left side and vertically centered
-    symbol_x = 0
-    symbol_y = (height - new_height) // 2
+    # Opaque and grayscale symbols can be pasted without expanding them to RGBA
+    if symbol_image.mode in ("1", "L", "RGB"):
+        return symbol_image, None
+    if symbol_image.mode == "LA":
+        return symbol_image.convert("L"), symbol_image.getchannel("A")
 
-    # Paste the symbol
-    image.paste(symbol_image, (symbol_x, symbol_y), symbol_image)
-    return "SYMBOL_ADDED"
+    # Use the RGBA symbol's own alpha channel as the mask
+    return symbol_image, symbol_image
+
+
+def render_label_bytes(set_code: str, set_name: str, release_date: str,
+                       symbol_data: Optional[bytes] = None) -> bytes:
+    """Render a label from prefetched data without network access and return the encoded file."""
+    image = draw_label_text(set_code, set_name, release_date)
+    if symbol_data is not None:
+        paste_symbol(image, Image.open(BytesIO(symbol_data)), set_code)
+
+    buffer = BytesIO()
+    save_label_image(image, buffer)
+    return buffer.getvalue()
 
 
-def create_label_image(set_code: str, set_name: str, release_date: str, 
-                      custom_symbol_path: Optional[str] = None, 
-                      interactive: bool = True) -> tuple[Image.Image, str]:
-    """Create the actual label image with text and symbol."""
+def render_label_sheet(labels: List[Tuple[str, str, str, Optional[bytes]]]) -> Image.Image:
+    """Render labels stacked top to bottom on a single sheet image."""
+    sheet = Image.new("RGB", (LABEL_WIDTH, LABEL_HEIGHT * len(labels)), (255, 255, 255))
+    draw = ImageDraw.Draw(sheet)
+    for index, (set_code, set_name, release_date, symbol_data) in enumerate(labels):
+        top = index * LABEL_HEIGHT
+        _draw_text(draw, top, set_code, set_name, format_release_date(release_date))
+        if symbol_data is not None:
+            paste_symbol(sheet, Image.open(BytesIO(symbol_data)), set_code, top)
+    return sheet
+
+
+def format_release_date(release_date: str) -> str:
+    """Convert a release date from YYYY-MM-DD to MM/YYYY."""
+    # Well-formed dates are sliced directly, avoiding the slow strptime parser
+    year, month, day = release_date[:4], release_date[5:7], release_date[8:]
+    if (len(release_date) == 10 and release_date[4] == "-" and release_date[7] == "-" 
+            and year.isdigit() and month.isdigit() and day.isdigit() 
+            and "01" <= month <= "12"):
+        return f"{month}/{year}"
+    return datetime.strptime(release_date, "%Y-%m-%d").strftime("%m/%Y")
+
+
+def draw_label_text(set_code: str, set_name: str, release_date: str) -> Image.Image:
+    """Create a blank label and draw the set name, code and release date."""
     # Convert release_date from YYYY-MM-DD to MM/YYYY
     try:
-        formatted_date = datetime.strptime(release_date, "%Y-%m-%d").strftime("%m/%Y")
+        formatted_date = format_release_date(release_date)
     except ValueError as e:
         logging.error(f"Invalid date format for {set_code}: {e}")
         raise
 
-    # Create a blank image with an RGB mode (white background)
-    width = 760
-    height = 140
-    image = Image.new("RGB", (width, height), (255, 255, 255))
-    draw = ImageDraw.Draw(image)
+    # Start from a copy of the blank RGB template (white background)
+    image = _blank_label().copy()
+    _draw_text(ImageDraw.Draw(image), 0, set_code, set_name, formatted_date)
+    return image
 
-    # Define layout constants
-    padding = 20  # Padding between elements
 
-    # Load fonts
-    original_font_size = 40
-    font_big = ImageFont.load_default(original_font_size)
-    font_small = ImageFont.load_default(30)
+def _draw_text(draw: ImageDraw.ImageDraw, top: int, set_code: str, set_name: str, 
+               formatted_date: str) -> None:
+    """Draw the set name, code and formatted date of the label starting at top."""
+    # Scale down font size if set name is too wide
+    name_font_size = _fit_name_font_size(set_name)
+    set_name_y, set_code_y = _text_baselines(name_font_size)
 
-    # Get font metrics
-    font_big_metrics = font_big.getmetrics()
-    font_small_metrics = font_small.getmetrics()
+    # Draw the texts
+    draw.text(
+        (TEXT_START_X, top + set_name_y),
+        set_name,
+        font=_font(name_font_size),
+        fill=(0, 0, 0),
+        anchor="ls",  # Left, baseline anchor
+    )
 
-    # Calculate ascent and descent for both fonts
-    big_ascent, big_descent = font_big_metrics
-    small_ascent, small_descent = font_small_metrics
+    draw.text(
+        (TEXT_START_X, top + set_code_y),
+        f"{set_code}   {formatted_date}",
+        font=_font(DETAIL_FONT_SIZE),
+        fill=(0, 0, 0),
+        anchor="ls",  # Left, baseline anchor
+    )
 
-    # Start position for text, will be the right side of the symbol
-    text_start_x = height + padding
 
-    # Calculate available width for text
-    available_width = width - text_start_x - padding
+def _fit_name_font_size(set_name: str) -> int:
+    """Find the largest font size, down to the minimum, that fits the set name."""
+    text_width = _font(NAME_FONT_SIZE).getlength(set_name)
+    if text_width <= AVAILABLE_TEXT_WIDTH:
+        return NAME_FONT_SIZE
 
-    # Scale down font size if set name is too wide
-    current_font_size = original_font_size
-    font_big = ImageFont.load_default(current_font_size)
-    text_width = font_big.getlength(set_name)
-
-    while text_width > available_width and current_font_size > 20:  # Minimum size of 20
-        current_font_size -= 1
-        font_big = ImageFont.load_default(current_font_size)
-        text_width = font_big.getlength(set_name)
-        # Update metrics for new font size
-        font_big_metrics = font_big.getmetrics()
-        big_ascent, big_descent = font_big_metrics
-
-    # Calculate text positions based on baseline
-    middle_y = height / 2
-    gap = 10  # Gap between the two text lines
+    # Text width grows almost linearly with font size, so the size estimated
+    # from the full-size width is usually the answer or one off; one real
+    # measurement next to it brackets the search around the estimate
+    estimate = max(MIN_NAME_FONT_SIZE, 
+                   min(NAME_FONT_SIZE - 1, int(NAME_FONT_SIZE * AVAILABLE_TEXT_WIDTH / text_width)))
+    if _font(estimate).getlength(set_name) <= AVAILABLE_TEXT_WIDTH:
+        low, high = estimate, NAME_FONT_SIZE - 1
+        if low < high and _font(low + 1).getlength(set_name) > AVAILABLE_TEXT_WIDTH:
+            return low
+    else:
+        low, high = MIN_NAME_FONT_SIZE, max(MIN_NAME_FONT_SIZE, estimate - 1)
+
+    # Binary search the remaining range for the largest size that fits; the
+    # minimum size is used even when the name still overflows
+    while low < high:
+        mid = (low + high + 1) // 2
+        if _font(mid).getlength(set_name) <= AVAILABLE_TEXT_WIDTH:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+@lru_cache(maxsize=64)
+def _text_baselines(name_font_size: int) -> Tuple[float, float]:
+    """Compute the baselines of both text lines, centered on the label, for a name font size."""
+    # Calculate ascent and descent for both fonts
+    big_ascent, big_descent = _font(name_font_size).getmetrics()
+    small_ascent, small_descent = _font(DETAIL_FONT_SIZE).getmetrics()
 
     # Calculate y positions to center both lines around middle_y using baselines
+    middle_y = LABEL_HEIGHT / 2
     total_text_height = (
-        (big_ascent + big_descent) + gap + (small_ascent + small_descent)
+        (big_ascent + big_descent) + LINE_GAP + (small_ascent + small_descent)
     )
     start_y = middle_y - total_text_height / 2
 
@@ -126,24 +314,4 @@ def create_label_image(set_code: str, set_name: str, release_date: str,
     # Position for set code and date (bottom line)
     set_code_y = set_name_y + (big_ascent + big_descent)
 
-    # Draw the texts
-    draw.text(
-        (text_start_x, set_name_y),
-        set_name,
-        font=font_big,
-        fill=(0, 0, 0),
-        anchor="ls",  # Left, baseline anchor
-    )
-
-    draw.text(
-        (text_start_x, set_code_y),
-        f"{set_code}   {formatted_date}",
-        font=font_small,
-        fill=(0, 0, 0),
-        anchor="ls",  # Left, baseline anchor
-    )
-
-    # Add set symbol and track result
-    symbol_result = add_set_symbol(image, set_code, custom_symbol_path, interactive)
-    
-    return image, symbol_result
+    return set_name_y, set_code_y
@@ -1,56 +1,58 @@
 """Core label processing logic."""
 
+import collections
 import os
 import logging
 import time
-import concurrent.futures
-from typing import Optional, Dict, List
+import multiprocessing
+import multiprocessing.pool
+from io import BytesIO
+from typing import Optional, Dict, List, Set, Tuple
+from PIL import Image
 
-from mtg_api import fetch_set_info
-from image_generator import create_label_image
+from mtg_api import (fetch_set_info, fetch_set_symbol_data, prefetch_set_info,
+                     prefetch_set_symbols, set_max_connections)
+from image_generator import (add_set_symbol, draw_label_text, format_release_date, 
+                             render_label_bytes, render_label_sheet, save_label_image, get_png_compress_level, 
+                             get_label_format, label_filename, max_sheet_labels, 
+                             init_render_worker)
 from cli import print_progress_bar, format_duration
 
 
+# Concurrent lookups for set codes that the bulk prefetch did not cover
+VALIDATION_WORKERS = 16
+
+# Concurrent downloads when fetching set data ahead of rendering
+FETCH_WORKERS = 10
+
+
 def create_label(set_code: str, custom_symbol_path: Optional[str] = None, 
                 skip_existing: bool = False, dry_run: bool = False, 
-                output_dir: str = "./labels", interactive: bool = True) -> str:
+                output_dir: str = "./labels", interactive: bool = True, 
+                existing_labels: Optional[Set[str]] = None) -> str:
     """Create a label for a Magic: The Gathering set."""
     set_code = set_code.upper()
-    output_path = f"{output_dir}/{set_code}_label.png"
+    output_path = f"{output_dir}/{label_filename(set_code)}"
     
     # Check if file already exists and should be skipped
-    if skip_existing and os.path.exists(output_path):
+    if skip_existing and _label_exists(set_code, output_dir, existing_labels):
         logging.debug(f"Skipping {set_code} - label already exists")
         return "skipped"
     
     # Fetch set information
-    info = fetch_set_info(set_code)
-    if not info:
-        logging.error(f"Failed to fetch information for {set_code}")
-        return "failed"
-    
-    set_name = info["name"]
-    release_date = info["date"]
-    
-    if not set_name or not release_date:
-        logging.error(f"Incomplete set information for {set_code}")
+    details = _fetch_label_details(set_code)
+    if not details:
         return "failed"
+    set_name, release_date = details
 
     if dry_run:
-        # Convert date for display
-        try:
-            from datetime import datetime
-            formatted_date = datetime.strptime(release_date, "%Y-%m-%d").strftime("%m/%Y")
-            logging.info(f"Would create: {set_code}_label.png - {set_name} ({formatted_date})")
-            return "success"
-        except ValueError:
-            logging.info(f"Would create: {set_code}_label.png - {set_name}")
-            return "success"
-
-    # Create the label image
+        _log_dry_run(set_code, set_name, release_date)
+        return "success"
+
+    # Create the label image, drawing the text once and adding the symbol on top
     try:
-        image, symbol_result = create_label_image(set_code, set_name, release_date, 
-                                                 custom_symbol_path, interactive)
+        image = draw_label_text(set_code, set_name, release_date)
+        symbol_result = add_set_symbol(image, set_code, custom_symbol_path, interactive)
         
         # Handle symbol not found in interactive mode
         if symbol_result == "NO_SYMBOL_FOUND" and interactive:
@@ -61,14 +63,11 @@ def create_label(set_code: str, custom_symbol_path: Optional[str] = None,
                 logging.info(f"Skipped {set_code} - user chose to skip")
                 return "skipped"
             elif user_choice == "NO_SYMBOL":
-                # Recreate image without symbol
-                image, _ = create_label_image(set_code, set_name, release_date, 
-                                           None, False)
+                # The text is already drawn, so the image is used as is
                 logging.info(f"Created text-only label for {set_code}")
             elif user_choice and user_choice not in ["SKIP", "NO_SYMBOL"]:
                 # User provided custom symbol path
-                image, _ = create_label_image(set_code, set_name, release_date, 
-                                           user_choice, False)
+                add_set_symbol(image, set_code, user_choice, False)
                 logging.info(f"Created label for {set_code} with custom symbol")
         elif symbol_result == "NO_SYMBOL_FOUND" and not interactive:
             logging.warning(f"No symbol found for {set_code}, creating text-only label")
@@ -77,31 +76,74 @@ def create_label(set_code: str, custom_symbol_path: Optional[str] = None,
         logging.error(f"Failed to create image for {set_code}: {e}")
         return "failed"
 
-    # Create the output folder if it doesn't exist
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
     # Save the image
     try:
-        image.save(output_path)
-        logging.info(f"Created label: {set_code}_label.png - {set_name}")
+        save_label_image(image, output_path)
+        if existing_labels is not None:
+            existing_labels.add(label_filename(set_code))
+        logging.info(f"Created label: {label_filename(set_code)} - {set_name}")
         return "success"
     except Exception as e:
         logging.error(f"Failed to save label for {set_code}: {e}")
         return "failed"
 
 
+def _label_exists(set_code: str, output_dir: str, 
+                  existing_labels: Optional[Set[str]] = None) -> bool:
+    """Check whether a label was already generated for a set."""
+    filename = label_filename(set_code)
+    if existing_labels is not None:
+        return filename in existing_labels
+    return os.path.exists(f"{output_dir}/{filename}")
+
+
+def _scan_existing_labels(output_dir: str) -> Set[str]:
+    """List the files in the output directory with a single directory scan."""
+    if not os.path.isdir(output_dir):
+        return set()
+    with os.scandir(output_dir) as entries:
+        return {entry.name for entry in entries}
+
+
+def _fetch_label_details(set_code: str) -> Optional[Tuple[str, str]]:
+    """Fetch the set name and release date needed to render a label."""
+    info = fetch_set_info(set_code)
+    if not info:
+        logging.error(f"Failed to fetch information for {set_code}")
+        return None
+    
+    set_name = info["name"]
+    release_date = info["date"]
+    
+    if not set_name or not release_date:
+        logging.error(f"Incomplete set information for {set_code}")
+        return None
+
+    return set_name, release_date
+
+
+def _log_dry_run(set_code: str, set_name: str, release_date: str):
+    """Log the label that would be created in dry-run mode."""
+    # Convert date for display
+    try:
+        formatted_date = format_release_date(release_date)
+        logging.info(f"Would create: {label_filename(set_code)} - {set_name} ({formatted_date})")
+    except ValueError:
+        logging.info(f"Would create: {label_filename(set_code)} - {set_name}")
+
+
 def process_text_file(filename: str, custom_symbol_path: Optional[str] = None, 
                      skip_existing: bool = False, dry_run: bool = False,
-                     output_dir: str = "./labels", parallel: Optional[int] = None) -> Dict[str, int]:
+                     output_dir: str = "./labels", parallel: Optional[int] = None, 
+                     sheet: bool = False) -> Dict[str, int]:
     """Process a text file containing set codes with progress tracking and error handling."""
     stats = {"processed": 0, "skipped": 0, "failed": 0, "total": 0}
     
     try:
-        # First count total lines to process
+        # Read every set code in a single pass; the list doubles as the total
         with open(filename, "r") as file:
-            set_codes = [line.strip().upper() for line in file if line.strip()]
-            stats["total"] = len(set_codes)
+            set_codes = [code for code in (line.strip().upper() for line in file) if code]
+        stats["total"] = len(set_codes)
 
         if stats["total"] == 0:
             logging.warning(f"No set codes found in {filename}")
@@ -111,13 +153,20 @@ def process_text_file(filename: str, custom_symbol_path: Optional[str] = None,
         
         if dry_run:
             logging.info("DRY RUN - No files will be created")
+        else:
+            # Create the output folder once for the whole batch
+            os.makedirs(output_dir, exist_ok=True)
+
+        prefetch_set_info(set_codes)
+        existing_labels = _scan_existing_labels(output_dir) if skip_existing else None
 
         # Process sets (parallel or sequential)
         start_time = time.time()
         
-        if parallel and parallel > 1:
-            stats = _process_parallel(set_codes, custom_symbol_path, skip_existing, 
-                                    dry_run, output_dir, parallel, stats)
+        if sheet and not dry_run:
+            sheet_name = os.path.splitext(os.path.basename(filename))[0]
+            stats = _process_sheet(set_codes, custom_symbol_path, output_dir, 
+                                   sheet_name, stats)
         else:
             # For batch processing, ask user about interactive mode for missing symbols
             interactive_batch = len(set_codes) <= 5  # Only interactive for small batches
@@ -129,8 +178,40 @@ def process_text_file(filename: str, custom_symbol_path: Optional[str] = None,
                     default=False
                 )
             
-            stats = _process_sequential(set_codes, custom_symbol_path, skip_existing, 
-                                      dry_run, output_dir, stats, interactive_batch)
+            # Rendering is CPU-bound, so labels are rendered on every core unless
+            # --parallel sets the worker count; a dry run renders nothing, so it
+            # only runs in parallel on request. Never start more workers than labels.
+            pending_codes = [
+                code for code in set_codes 
+                if not (skip_existing and _label_exists(code, output_dir, existing_labels))
+            ]
+            if parallel:
+                workers = parallel
+            elif dry_run:
+                workers = 1
+            else:
+                workers = os.cpu_count() or 1
+            workers = max(1, min(workers, len(pending_codes)))
+
+            if workers == 1:
+                stats = _process_sequential(set_codes, custom_symbol_path, skip_existing, 
+                                          dry_run, output_dir, stats, interactive_batch, 
+                                          existing_labels)
+            else:
+                # A missing or unreadable custom symbol falls back to fetched symbols
+                custom_symbol_data = _read_custom_symbol(custom_symbol_path)
+                symbol_decisions = None
+                if interactive_batch and not dry_run:
+                    # Ask about every missing symbol up front, then render without prompts
+                    symbol_decisions = _resolve_missing_symbols(
+                        set_codes, custom_symbol_data, skip_existing, output_dir, 
+                        existing_labels)
+                elif not dry_run and custom_symbol_data is None:
+                    # Download all symbols up front so the workers only render
+                    prefetch_set_symbols(pending_codes, FETCH_WORKERS)
+                stats = _process_parallel(set_codes, custom_symbol_data, skip_existing, 
+                                        dry_run, output_dir, workers, stats, 
+                                        existing_labels, symbol_decisions)
         
         # Show final summary with timing
         elapsed = time.time() - start_time
@@ -151,7 +232,8 @@ def process_text_file(filename: str, custom_symbol_path: Optional[str] = None,
 
 def _process_sequential(set_codes: List[str], custom_symbol_path: Optional[str], 
                        skip_existing: bool, dry_run: bool, output_dir: str, 
-                       stats: Dict[str, int], interactive_batch: bool = False) -> Dict[str, int]:
+                       stats: Dict[str, int], interactive_batch: bool = False, 
+                       existing_labels: Optional[Set[str]] = None) -> Dict[str, int]:
     """Process set codes sequentially with progress bar."""
     for i, set_code in enumerate(set_codes, 1):
         # Progress bar
@@ -161,7 +243,7 @@ def _process_sequential(set_codes: List[str], custom_symbol_path: Optional[str],
         
         try:
             result = create_label(set_code, custom_symbol_path, skip_existing, 
-                                dry_run, output_dir, interactive_batch)
+                                dry_run, output_dir, interactive_batch, existing_labels)
             if result == "skipped":
                 stats["skipped"] += 1
             elif result == "failed":
@@ -181,66 +263,283 @@ def _process_sequential(set_codes: List[str], custom_symbol_path: Optional[str],
     return stats
 
 
-def _process_parallel(set_codes: List[str], custom_symbol_path: Optional[str], 
+def _process_parallel(set_codes: List[str], custom_symbol_data: Optional[bytes], 
                      skip_existing: bool, dry_run: bool, output_dir: str, 
-                     parallel: int, stats: Dict[str, int]) -> Dict[str, int]:
-    """Process set codes in parallel with progress tracking."""
+                     parallel: int, stats: Dict[str, int], 
+                     existing_labels: Optional[Set[str]] = None, 
+                     symbol_decisions: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """Process set codes in parallel, fetching on threads and rendering in processes."""
     completed = 0
+
+    def record(result: str):
+        nonlocal completed
+        completed += 1
+        if result == "skipped":
+            stats["skipped"] += 1
+        elif result == "failed":
+            stats["failed"] += 1
+        else:
+            stats["processed"] += 1
+
+        # Update progress bar
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            print_progress_bar(completed, stats['total'], prefix="Progress", 
+                             suffix=f"({parallel} workers)")
     
-    def process_single(set_code: str) -> str:
-        # Parallel processing is always non-interactive
-        return create_label(set_code, custom_symbol_path, skip_existing, 
-                          dry_run, output_dir, interactive=False)
+    def prepare_single(set_code: str) -> Tuple[str, Optional[tuple]]:
+        # Parallel processing never prompts; decisions are made beforehand
+        try:
+            return _prepare_label(set_code, custom_symbol_data, skip_existing, 
+                                  dry_run, output_dir, existing_labels, symbol_decisions)
+        except Exception as e:
+            logging.error(f"Unexpected error processing {set_code}: {e}")
+            return "failed", None
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel) as executor:
-        # Submit all tasks
-        future_to_code = {executor.submit(process_single, code): code 
-                         for code in set_codes}
-        
-        # Process completed tasks
-        for future in concurrent.futures.as_completed(future_to_code):
-            set_code = future_to_code[future]
-            completed += 1
-            
-            # Update progress bar
-            if not logging.getLogger().isEnabledFor(logging.DEBUG):
-                print_progress_bar(completed, stats['total'], prefix="Progress", 
-                                 suffix=f"({parallel} parallel)")
-            
-            try:
-                result = future.result()
-                if result == "skipped":
-                    stats["skipped"] += 1
-                elif result == "failed":
-                    stats["failed"] += 1
-                else:
-                    stats["processed"] += 1
-            except Exception as e:
-                logging.error(f"Unexpected error processing {set_code}: {e}")
-                stats["failed"] += 1
+    def save_single(rendered: Tuple[str, str, Optional[bytes]]) -> str:
+        set_code, set_name, label_data = rendered
+        return _save_label(label_data, set_code, set_name, output_dir)
+    
+    # Results of sets that were settled without rendering (skipped, failed, dry run)
+    settled = collections.deque()
+
+    def ready_jobs(prepared):
+        for result, job in prepared:
+            if job:
+                yield job
+            else:
+                settled.append(result)
+
+    def record_settled():
+        while settled:
+            record(settled.popleft())
+    
+    # Fetch set information and symbols concurrently on threads
+    set_max_connections(parallel)
+    if dry_run:
+        with multiprocessing.pool.ThreadPool(parallel) as fetch_pool:
+            for result, _ in fetch_pool.imap_unordered(prepare_single, set_codes):
+                record(result)
+        return stats
+
+    # Fork the render workers before any fetch thread starts, so no worker can
+    # inherit a lock (e.g. an import lock taken by Image.open) held by a thread
+    # that does not exist in the child; PIL's plugins are registered up front
+    Image.init()
+    with multiprocessing.Pool(parallel, initializer=init_render_worker, 
+                              initargs=(get_png_compress_level(), get_label_format())) as render_pool:
+        # Render labels in worker processes as soon as their data is fetched, and
+        # save them on a single writer thread while the parent records progress;
+        # jobs stream through instead of being collected
+        chunksize = max(1, min(4, len(set_codes) // (parallel * 4)))
+        with multiprocessing.pool.ThreadPool(parallel) as fetch_pool:
+            prepared = fetch_pool.imap_unordered(prepare_single, set_codes)
+            rendered = render_pool.imap_unordered(_render_job, ready_jobs(prepared), chunksize)
+            with multiprocessing.pool.ThreadPool(1) as writer:
+                for result in writer.imap_unordered(save_single, rendered):
+                    record_settled()
+                    record(result)
     
+    record_settled()
     return stats
 
 
+def _process_sheet(set_codes: List[str], custom_symbol_path: Optional[str], 
+                   output_dir: str, sheet_name: str, stats: Dict[str, int]) -> Dict[str, int]:
+    """Render every label onto sheets in input order and save each sheet with one encode."""
+    custom_symbol_data = _read_custom_symbol(custom_symbol_path)
+    if custom_symbol_data is None:
+        prefetch_set_symbols(set_codes, FETCH_WORKERS)
+
+    # Everything is cached by now, so preparing the labels does no network work
+    labels = []
+    for set_code in set_codes:
+        _, job = _prepare_label(set_code, custom_symbol_data, False, False, "")
+        if job is None:
+            stats["failed"] += 1
+            continue
+        try:
+            format_release_date(job[2])
+        except ValueError as e:
+            logging.error(f"Invalid date format for {set_code}: {e}")
+            stats["failed"] += 1
+            continue
+        # Every row shares one canvas, so a symbol that does not decode fails
+        # only its own label here instead of the whole sheet; the custom symbol
+        # was already validated when it was read
+        symbol_data = job[3]
+        if (symbol_data is not None and symbol_data is not custom_symbol_data and 
+                not _is_readable_image(symbol_data)):
+            logging.error(f"Failed to create image for {set_code}: cannot identify symbol image")
+            stats["failed"] += 1
+            continue
+        labels.append(job)
+
+    if not labels:
+        return stats
+
+    # Formats with a maximum image height are split over as many sheets as needed
+    per_sheet = max_sheet_labels() or len(labels)
+    sheets = [labels[i:i + per_sheet] for i in range(0, len(labels), per_sheet)]
+    for number, sheet_labels in enumerate(sheets, 1):
+        suffix = f"_{number}" if len(sheets) > 1 else ""
+        sheet_path = f"{output_dir}/{sheet_name}_sheet{suffix}.{get_label_format()}"
+        try:
+            save_label_image(render_label_sheet(sheet_labels), sheet_path)
+        except Exception as e:
+            logging.error(f"Failed to save label sheet {sheet_path}: {e}")
+            stats["failed"] += len(sheet_labels)
+            continue
+
+        stats["processed"] += len(sheet_labels)
+        logging.info(f"Created label sheet: {sheet_path} - {len(sheet_labels)} labels")
+    return stats
+
+
+def _resolve_missing_symbols(set_codes: List[str], custom_symbol_data: Optional[bytes], 
+                             skip_existing: bool, output_dir: str, 
+                             existing_labels: Optional[Set[str]]) -> Dict[str, str]:
+    """Find every set without a symbol and ask the user how to handle them all at once."""
+    if custom_symbol_data is not None:
+        return {}
+
+    def check_single(set_code: str) -> Optional[Tuple[str, str]]:
+        if skip_existing and _label_exists(set_code, output_dir, existing_labels):
+            return None
+        info = fetch_set_info(set_code)
+        if not info or fetch_set_symbol_data(set_code) is not None:
+            return None
+        return set_code, info["name"]
+
+    # Fetch set info and symbols concurrently before any prompt is shown
+    set_max_connections(FETCH_WORKERS)
+    with multiprocessing.pool.ThreadPool(FETCH_WORKERS) as pool:
+        missing = [item for item in pool.imap(check_single, dict.fromkeys(set_codes)) 
+                   if item]
+
+    if not missing:
+        return {}
+
+    from cli import prompt_for_missing_symbols
+    return prompt_for_missing_symbols(missing)
+
+
+def _read_custom_symbol(custom_symbol_path: Optional[str]) -> Optional[bytes]:
+    """Read a custom symbol file so it can be shared with worker processes."""
+    if not custom_symbol_path or not os.path.exists(custom_symbol_path):
+        return None
+    try:
+        with open(custom_symbol_path, "rb") as file:
+            symbol_data = file.read()
+    except OSError as e:
+        logging.warning(f"Error loading custom symbol: {e}")
+        return None
+
+    # Check the file once here, so an unreadable symbol falls back to the
+    # fetched ones instead of failing every label in the workers
+    if not _is_readable_image(symbol_data):
+        logging.warning(f"Error loading custom symbol: cannot identify image file {custom_symbol_path}")
+        return None
+    return symbol_data
+
+
+def _is_readable_image(image_data: bytes) -> bool:
+    """Check that image data can be decoded without fully loading it."""
+    try:
+        Image.open(BytesIO(image_data)).verify()
+        return True
+    except Exception:
+        return False
+
+
+def _prepare_label(set_code: str, custom_symbol_data: Optional[bytes], 
+                   skip_existing: bool, dry_run: bool, output_dir: str, 
+                   existing_labels: Optional[Set[str]] = None, 
+                   symbol_decisions: Optional[Dict[str, str]] = None) -> Tuple[str, Optional[tuple]]:
+    """Fetch everything needed to render a label without rendering it."""
+    set_code = set_code.upper()
+    
+    if skip_existing and _label_exists(set_code, output_dir, existing_labels):
+        logging.debug(f"Skipping {set_code} - label already exists")
+        return "skipped", None
+    
+    details = _fetch_label_details(set_code)
+    if not details:
+        return "failed", None
+    set_name, release_date = details
+
+    if dry_run:
+        _log_dry_run(set_code, set_name, release_date)
+        return "success", None
+
+    symbol_data = custom_symbol_data or fetch_set_symbol_data(set_code)
+    if symbol_data is None:
+        decision = (symbol_decisions or {}).get(set_code, "NO_SYMBOL")
+        if decision == "SKIP":
+            logging.info(f"Skipped {set_code} - user chose to skip")
+            return "skipped", None
+        elif decision != "NO_SYMBOL":
+            # User provided custom symbol path
+            symbol_data = _read_custom_symbol(decision)
+        if symbol_data is None:
+            logging.debug(f"No symbol found for {set_code}, continuing without symbol")
+
+    return "ready", (set_code, set_name, release_date, symbol_data)
+
+
+def _render_job(job: tuple) -> Tuple[str, str, Optional[bytes]]:
+    """Render a single label in a worker process."""
+    set_code, set_name, release_date, symbol_data = job
+    try:
+        label_data = render_label_bytes(set_code, set_name, release_date, symbol_data)
+    except Exception as e:
+        logging.error(f"Failed to create image for {set_code}: {e}")
+        label_data = None
+    return set_code, set_name, label_data
+
+
+def _save_label(label_data: Optional[bytes], set_code: str, set_name: str, 
+                output_dir: str) -> str:
+    """Write a rendered label to the output directory."""
+    if label_data is None:
+        return "failed"
+    try:
+        with open(f"{output_dir}/{label_filename(set_code)}", "wb") as file:
+            file.write(label_data)
+        logging.info(f"Created label: {label_filename(set_code)} - {set_name}")
+        return "success"
+    except Exception as e:
+        logging.error(f"Failed to save label for {set_code}: {e}")
+        return "failed"
+
+
 def validate_set_codes(set_codes: List[str]) -> Dict[str, List[str]]:
     """Validate a list of set codes without generating labels."""
     results = {"valid": [], "invalid": [], "errors": []}
     
     logging.info(f"Validating {len(set_codes)} set codes...")
-    
-    for i, set_code in enumerate(set_codes, 1):
-        if not logging.getLogger().isEnabledFor(logging.DEBUG):
-            print_progress_bar(i-1, len(set_codes), prefix="Validating", 
-                             suffix=f"Checking {set_code}")
-        
+    prefetch_set_info(set_codes)
+
+    def check_single(set_code: str) -> Tuple[str, Optional[dict], Optional[Exception]]:
         try:
-            info = fetch_set_info(set_code)
-            if info and info.get("name"):
+            return set_code, fetch_set_info(set_code), None
+        except Exception as e:
+            return set_code, None, e
+    
+    # Codes not covered by the prefetch are looked up concurrently
+    workers = max(1, min(VALIDATION_WORKERS, len(set_codes)))
+    set_max_connections(workers)
+    with multiprocessing.pool.ThreadPool(workers) as pool:
+        for i, (set_code, info, error) in enumerate(pool.imap(check_single, set_codes), 1):
+            if not logging.getLogger().isEnabledFor(logging.DEBUG):
+                print_progress_bar(i, len(set_codes), prefix="Validating", 
+                                 suffix=f"Checked {set_code}")
+            
+            if error:
+                results["errors"].append(f"{set_code}: {str(error)}")
+            elif info and info.get("name"):
                 results["valid"].append(f"{set_code}: {info['name']}")
             else:
                 results["invalid"].append(set_code)
-        except Exception as e:
-            results["errors"].append(f"{set_code}: {str(e)}")
     
     # Final progress
     if not logging.getLogger().isEnabledFor(logging.DEBUG):
@@ -6,11 +6,19 @@ Generate professional-looking labels for Magic: The Gathering card sets.
 """
 
 import logging
+import os
+import re
 import sys
+from typing import Optional
 
 from cli import parse_arguments, setup_logging, is_text_file, confirm_action
 from label_processor import create_label, process_text_file, validate_set_codes
-from mtg_api import get_recent_sets
+from mtg_api import get_recent_sets, disable_cache
+from image_generator import set_label_format, set_png_compress_level
+
+
+# A plain set code such as AFR or M21, which can skip option parsing entirely
+SET_CODE_PATTERN = re.compile(r"[A-Za-z0-9]{3,5}")
 
 
 def show_recent_sets():
@@ -37,8 +45,26 @@ def show_recent_sets():
         print(f"  python labels.py {example_code}")
 
 
+def create_single_label(set_code: str, custom_symbol_path: Optional[str] = None, 
+                        skip_existing: bool = False, dry_run: bool = False, 
+                        output_dir: str = "./labels") -> int:
+    """Create the label for a single set code and return the exit code."""
+    if not dry_run:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    # Always interactive for single sets
+    result = create_label(set_code, custom_symbol_path, skip_existing, 
+                        dry_run, output_dir, interactive=True)
+    return 0 if result in ["success", "skipped"] else 1
+
+
 def main():
     """Main entry point for the MTG label generator."""
+    # Fast path for the common "labels.py AFR" invocation with default options
+    if len(sys.argv) == 2 and SET_CODE_PATTERN.fullmatch(sys.argv[1]):
+        setup_logging(verbose=False, quiet=False)
+        return create_single_label(sys.argv[1])
+
     args = parse_arguments()
     
     # Handle special commands that don't require input
@@ -62,6 +88,15 @@ def main():
         logging.error("Cannot use --skip and --force together")
         return 1
     
+    # --sheet writes one image per text file, so per-label options do not apply
+    if args.sheet:
+        sheet_conflicts = [option for option, used in (
+            ("--dry-run", args.dry_run), ("--parallel", args.parallel), ("--skip", args.skip),
+        ) if used]
+        if sheet_conflicts:
+            logging.error(f"Cannot use --sheet with {', '.join(sheet_conflicts)}")
+            return 1
+    
     input_value = args.input
     custom_symbol_path = args.symbol
     skip_existing = args.skip and not args.force
@@ -69,6 +104,11 @@ def main():
     output_dir = args.output_dir
     parallel = args.parallel
 
+    if args.no_cache:
+        disable_cache()
+    set_png_compress_level(args.png_level)
+    set_label_format(args.format)
+
     # Handle validation mode
     if args.validate:
         if "." in input_value and is_text_file(input_value):
@@ -105,9 +145,11 @@ def main():
         
         return 1 if results['invalid'] or results['errors'] else 0
 
-    # Warn about parallel processing limitations
-    if parallel and parallel > 1:
-        if not confirm_action(f"Process {parallel} sets in parallel? This may hit API rate limits", default=True):
+    # Warn when asking for more workers than the default of one per core
+    default_workers = os.cpu_count() or 1
+    if parallel and parallel > default_workers:
+        if not confirm_action(f"Use {parallel} parallel workers, more than the default of "
+                              f"{default_workers}? This may hit API rate limits", default=True):
             logging.info("Operation cancelled by user")
             return 0
 
@@ -115,7 +157,7 @@ def main():
     if "." in input_value:
         if is_text_file(input_value):
             stats = process_text_file(input_value, custom_symbol_path, skip_existing, 
-                                    dry_run, output_dir, parallel)
+                                    dry_run, output_dir, parallel, args.sheet)
             
             # Show summary
             total_attempted = stats["processed"] + stats["failed"]
@@ -133,10 +175,11 @@ def main():
             logging.error(f"'{input_value}' is not a text file. Please provide a .txt file or a set code.")
             return 1
     else:
-        # Treat as direct set code - always interactive for single sets
-        result = create_label(input_value, custom_symbol_path, skip_existing, 
-                            dry_run, output_dir, interactive=True)
-        return 0 if result in ["success", "skipped"] else 1
+        # Treat as direct set code
+        if args.sheet:
+            logging.warning("--sheet only applies to text files; creating a single label")
+        return create_single_label(input_value, custom_symbol_path, skip_existing, 
+                                   dry_run, output_dir)
 
 
 if __name__ == "__main__":
@@ -1,101 +1,352 @@
 """MTG API operations for fetching set information and symbols."""
 
+import json
+import multiprocessing.pool
+import os
+import tempfile
 import requests
 import time
 import logging
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from typing import Optional, Dict, Any, List
 from PIL import Image
 from io import BytesIO
 
 
-def fetch_set_info(set_code: str, max_retries: int = 3) -> Optional[Dict[str, Any]]:
-    """Fetch set information from Scryfall API with retry logic."""
+CACHE_DIR = Path.home() / ".cache" / "mtg-stickers"
+SYMBOL_CACHE_DIR = CACHE_DIR / "symbols"
+
+# Seconds before cached set info and symbols are fetched again
+CACHE_TTL = 24 * 60 * 60
+
+# Batches with more uncached codes than this use a single bulk request
+BULK_FETCH_THRESHOLD = 3
+
+# Connection pool size, large enough for every worker count used
+DEFAULT_MAX_CONNECTIONS = 64
+
+# Retry policy applied by the session to every request; Scryfall asks for
+# 50-100ms between requests and sends Retry-After when rate limiting
+MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.1
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# Shared session so concurrent fetches reuse pooled TCP/TLS connections
+_session = requests.Session()
+_session.headers.update({
+    "User-Agent": "mtg-stickers/1.0",
+    "Accept": "application/json;q=0.9,*/*;q=0.8",
+})
+
+_use_disk_cache = True
+_set_info_cache: Dict[str, Dict[str, Any]] = {}
+_symbol_data_cache: Dict[str, Optional[bytes]] = {}
+_all_sets_index: Optional[Dict[str, Dict[str, Any]]] = None
+_max_connections = 0
+
+
+def disable_cache():
+    """Ignore previously cached set information and symbols and always fetch them."""
+    global _use_disk_cache
+    _use_disk_cache = False
+
+
+def set_max_connections(max_connections: int):
+    """Grow the HTTP connection pool to cover the given number of concurrent fetches."""
+    global _max_connections
+    # Remounting discards the warm keep-alive connections, so only grow the pool
+    if max_connections <= _max_connections:
+        return
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, max_retries=retry)
+    _session.mount("https://", adapter)
+    _session.mount("http://", adapter)
+    _max_connections = max_connections
+
+
+set_max_connections(DEFAULT_MAX_CONNECTIONS)
+
+
+def _is_cache_fresh(cache_file: Path) -> bool:
+    """Check whether a cache file exists and is younger than CACHE_TTL."""
+    if not _use_disk_cache:
+        return False
+    try:
+        return time.time() - cache_file.stat().st_mtime < CACHE_TTL
+    except OSError:
+        return False
+
+
+def _load_cached_json(cache_file: Path) -> Optional[Any]:
+    """Load JSON data from the on-disk cache."""
+    if not _is_cache_fresh(cache_file):
+        return None
+    try:
+        with cache_file.open("r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _store_cached_json(cache_file: Path, data: Any):
+    """Write JSON data to the on-disk cache."""
+    try:
+        _write_cache_file(cache_file, json.dumps(data).encode("utf-8"))
+    except OSError as e:
+        logging.debug(f"Could not write cache file {cache_file.name}: {e}")
+
+
+def _write_cache_file(cache_file: Path, data: bytes):
+    """Write a cache file atomically so an interrupted write never leaves a partial entry."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, cache_file)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _load_cached_set_info(set_code: str) -> Optional[Dict[str, Any]]:
+    """Load set information from the on-disk cache."""
+    return _load_cached_json(CACHE_DIR / f"{set_code}.json")
+
+
+def _store_cached_set_info(set_code: str, info: Dict[str, Any]):
+    """Write set information to the on-disk cache."""
+    _store_cached_json(CACHE_DIR / f"{set_code}.json", info)
+
+
+def fetch_set_info(set_code: str) -> Optional[Dict[str, Any]]:
+    """Fetch set information, using the in-memory and on-disk caches when possible."""
+    set_code = set_code.upper()
+    if set_code in _set_info_cache:
+        return _set_info_cache[set_code]
+
+    info = _load_cached_set_info(set_code)
+    if info:
+        logging.debug(f"Using cached set info for {set_code}")
+    elif _all_sets_index and set_code in _all_sets_index:
+        info = _to_set_info(set_code, _all_sets_index[set_code])
+        _store_cached_set_info(set_code, info)
+    else:
+        info = _request_set_info(set_code)
+        if not info:
+            return None
+        _store_cached_set_info(set_code, info)
+
+    _set_info_cache[set_code] = info
+    return info
+
+
+def prefetch_set_info(set_codes: List[str]):
+    """Populate the set info cache for a batch of codes with one bulk request."""
+    missing = set()
+    for set_code in set_codes:
+        set_code = set_code.upper()
+        if set_code in _set_info_cache:
+            continue
+        info = _load_cached_set_info(set_code)
+        if info:
+            _set_info_cache[set_code] = info
+        else:
+            missing.add(set_code)
+
+    # Codes still missing after a bulk fetch are left to the per-code endpoint
+    if len(missing) <= BULK_FETCH_THRESHOLD:
+        return
+
+    sets_index = fetch_all_sets_index()
+    if sets_index is None:
+        return
+
+    for set_code in missing:
+        if set_code in sets_index:
+            info = _to_set_info(set_code, sets_index[set_code])
+            _set_info_cache[set_code] = info
+            _store_cached_set_info(set_code, info)
+    logging.debug(f"Prefetched set info for {len(missing)} set codes")
+
+
+def _to_set_info(set_code: str, set_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the fields used for labels from a Scryfall set object."""
+    return {
+        "code": set_code,
+        "name": set_data.get("name"),
+        "date": set_data.get("released_at"),
+    }
+
+
+def _request_set_info(set_code: str) -> Optional[Dict[str, Any]]:
+    """Fetch set information from Scryfall API."""
     url = f"https://api.scryfall.com/sets/{set_code}"
     
-    for attempt in range(max_retries):
-        try:
-            logging.debug(f"Fetching set info for {set_code} (attempt {attempt + 1}/{max_retries})")
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                set_data = response.json()
-                return {
-                    "code": set_code,
-                    "name": set_data.get("name"),
-                    "date": set_data.get("released_at"),
-                }
-            elif response.status_code == 404:
-                logging.error(f"Set '{set_code}' not found")
-                return None
-            elif response.status_code == 429:  # Rate limited
-                wait_time = 2 ** attempt
-                logging.warning(f"Rate limited, waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
-                continue
-            else:
-                logging.warning(f"HTTP {response.status_code} for {set_code}, attempt {attempt + 1}")
-                
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"Network error for {set_code}: {e}")
-            
-        if attempt < max_retries - 1:
-            wait_time = 2 ** attempt
-            logging.debug(f"Waiting {wait_time}s before retry...")
-            time.sleep(wait_time)
+    try:
+        logging.debug(f"Fetching set info for {set_code}")
+        response = _session.get(url, timeout=10)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Failed to fetch set info for {set_code}: {e}")
+        return None
     
-    logging.error(f"Failed to fetch set info for {set_code} after {max_retries} attempts")
+    if response.status_code == 200:
+        return _to_set_info(set_code, response.json())
+    elif response.status_code == 404:
+        logging.error(f"Set '{set_code}' not found")
+    else:
+        logging.error(f"Failed to fetch set info for {set_code}: HTTP {response.status_code}")
     return None
 
 
-def fetch_set_symbol(set_code: str, max_retries: int = 3) -> Optional[Image.Image]:
-    """Fetch set symbol image from MTG Collection Builder with retry logic."""
-    for attempt in range(max_retries):
+def fetch_set_symbol(set_code: str) -> Optional[Image.Image]:
+    """Fetch set symbol image from MTG Collection Builder."""
+    symbol_data = fetch_set_symbol_data(set_code)
+    if symbol_data is None:
+        return None
+    return Image.open(BytesIO(symbol_data))
+
+
+def fetch_set_symbol_data(set_code: str) -> Optional[bytes]:
+    """Fetch raw set symbol PNG bytes, using the in-memory and on-disk caches when possible."""
+    set_code = set_code.upper()
+    if set_code in _symbol_data_cache:
+        return _symbol_data_cache[set_code]
+
+    symbol_data = _load_cached_symbol(set_code)
+    if symbol_data is not None:
+        logging.debug(f"Using cached symbol for {set_code}")
+    else:
+        symbol_data = _request_set_symbol_data(set_code)
+        if symbol_data is not None:
+            _store_cached_symbol(set_code, symbol_data)
+
+    # Sets without a symbol are cached as empty data, so they are not requested
+    # again this run or, until the cache expires, in later runs
+    symbol_data = symbol_data or None
+    _symbol_data_cache[set_code] = symbol_data
+    return symbol_data
+
+
+def _load_cached_symbol(set_code: str) -> Optional[bytes]:
+    """Load a set symbol from the on-disk cache; empty bytes mean the set has none."""
+    cache_file = SYMBOL_CACHE_DIR / f"{set_code}.png"
+    if not _is_cache_fresh(cache_file):
+        return None
+    try:
+        symbol_data = cache_file.read_bytes()
+    except OSError:
+        return None
+
+    # A symbol that does not decode, e.g. one left by an older partial write,
+    # is treated as a miss so it gets fetched and replaced
+    if symbol_data:
         try:
-            logging.debug(f"Fetching symbol for {set_code} (attempt {attempt + 1}/{max_retries})")
-            response = requests.get(
-                url=f"https://mtgcollectionbuilder.com/images/symbols/sets/{set_code}.png",
-                timeout=10
-            )
-            if response.status_code == 200:
-                png_image = response.content
-                return Image.open(BytesIO(png_image))
-            elif response.status_code == 404:
-                logging.debug(f"No symbol image available for {set_code}")
-                return None
-            else:
-                logging.warning(f"HTTP {response.status_code} fetching symbol for {set_code}")
-                
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"Network error fetching symbol for {set_code}: {e}")
-            
-        if attempt < max_retries - 1:
-            wait_time = 2 ** attempt
-            logging.debug(f"Waiting {wait_time}s before retry...")
-            time.sleep(wait_time)
+            Image.open(BytesIO(symbol_data)).verify()
+        except Exception as e:
+            logging.debug(f"Ignoring unreadable cached symbol for {set_code}: {e}")
+            return None
+    return symbol_data
+
+
+def _store_cached_symbol(set_code: str, symbol_data: bytes):
+    """Write a set symbol to the on-disk cache."""
+    try:
+        _write_cache_file(SYMBOL_CACHE_DIR / f"{set_code}.png", symbol_data)
+    except OSError as e:
+        logging.debug(f"Could not write symbol cache for {set_code}: {e}")
+
+
+def prefetch_set_symbols(set_codes: List[str], max_workers: int):
+    """Download the symbols for a batch of set codes concurrently into the cache."""
+    set_codes = list(dict.fromkeys(set_code.upper() for set_code in set_codes))
+    if not set_codes:
+        return
+    
+    workers = min(max_workers, len(set_codes))
+    set_max_connections(workers)
+    with multiprocessing.pool.ThreadPool(workers) as pool:
+        pool.map(fetch_set_symbol_data, set_codes)
+
+
+def _request_set_symbol_data(set_code: str) -> Optional[bytes]:
+    """Fetch raw set symbol PNG bytes from MTG Collection Builder, or empty bytes if it has none."""
+    try:
+        logging.debug(f"Fetching symbol for {set_code}")
+        response = _session.get(
+            url=f"https://mtgcollectionbuilder.com/images/symbols/sets/{set_code}.png",
+            timeout=10
+        )
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Failed to fetch symbol for {set_code}: {e}")
+        return None
     
-    logging.warning(f"Failed to fetch symbol for {set_code} after {max_retries} attempts")
+    if response.status_code == 200:
+        return response.content
+    elif response.status_code == 404:
+        logging.debug(f"No symbol image available for {set_code}")
+        return b""
+    else:
+        logging.warning(f"Failed to fetch symbol for {set_code}: HTTP {response.status_code}")
     return None
 
 
-def get_recent_sets(limit: int = 20) -> List[Dict[str, Any]]:
-    """Get recent MTG sets from Scryfall API."""
+def fetch_all_sets() -> Optional[List[Dict[str, Any]]]:
+    """Fetch every set from Scryfall API in a single request."""
     try:
-        logging.debug("Fetching recent sets from Scryfall...")
-        response = requests.get("https://api.scryfall.com/sets", timeout=10)
+        logging.debug("Fetching all sets from Scryfall...")
+        response = _session.get("https://api.scryfall.com/sets", timeout=10)
         
         if response.status_code == 200:
-            data = response.json()
-            sets = data.get("data", [])
-            
-            # Filter to only released sets and sort by release date
-            released_sets = [s for s in sets if s.get("released_at")]
-            released_sets.sort(key=lambda x: x.get("released_at", ""), reverse=True)
-            
-            return released_sets[:limit]
+            return response.json().get("data", [])
         else:
-            logging.error(f"Failed to fetch recent sets: HTTP {response.status_code}")
-            return []
+            logging.warning(f"Failed to fetch set list: HTTP {response.status_code}")
+            return None
             
     except requests.exceptions.RequestException as e:
-        logging.error(f"Network error fetching recent sets: {e}")
+        logging.warning(f"Network error fetching set list: {e}")
+        return None
+
+
+def fetch_all_sets_index() -> Optional[Dict[str, Dict[str, Any]]]:
+    """Get every set keyed by uppercase code, cached in memory and on disk."""
+    global _all_sets_index
+    if _all_sets_index is not None:
+        return _all_sets_index
+
+    cache_file = CACHE_DIR / "sets.json"
+    sets = _load_cached_json(cache_file)
+    if sets is None:
+        sets = fetch_all_sets()
+        if sets is None:
+            return None
+        _store_cached_json(cache_file, sets)
+
+    _all_sets_index = {s.get("code", "").upper(): s for s in sets}
+    return _all_sets_index
+
+
+def get_recent_sets(limit: int = 20) -> List[Dict[str, Any]]:
+    """Get recent MTG sets from Scryfall API."""
+    sets_index = fetch_all_sets_index()
+    if sets_index is None:
         return []
+    sets = list(sets_index.values())
+    
+    # Filter to only released sets and sort by release date
+    released_sets = [s for s in sets if s.get("released_at")]
+    released_sets.sort(key=lambda x: x.get("released_at", ""), reverse=True)
+    
+    return released_sets[:limit]